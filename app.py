@@ -2,22 +2,62 @@
 
 # No more !pip install lines, these are for Colab and handled by requirements.txt
 
-from flask import Flask, request, jsonify, render_template_string, redirect, url_for
+from flask import Flask, request, jsonify, redirect, url_for
+from flask.json.provider import DefaultJSONProvider
+import logging
 import os
-import json
+import tempfile
+import threading
 import time
-from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import orjson
 import requests
+from cachetools import TTLCache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from celery import Celery
+from cryptography.hazmat.primitives import serialization
 from boxsdk.auth.jwt_auth import JWTAuth
 from boxsdk import Client# No more pyngrok import needed for production deployment
-import traceback # ADD THIS LINE
+from boxsdk.exception import BoxAPIException
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+
+# Debug tracing is gated behind the logging framework so it costs nothing in
+# production (set LOG_LEVEL=DEBUG to enable). Lazy %-formatting means disabled
+# records skip string interpolation entirely.
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO'))
+logger = logging.getLogger(__name__)
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    JSON provider backed by orjson so every jsonify() — most importantly the
+    /status endpoint the browser polls every couple of seconds — serializes
+    through C code instead of stdlib json.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+# Celery handles the long-running merge work so gunicorn workers are not tied up
+# polling PDF.co. The broker/backend default to a local Redis for development;
+# set REDIS_URL in production (e.g. the Render Redis add-on URL).
+celery = Celery(
+    app.name,
+    broker=os.environ.get('REDIS_URL', 'redis://localhost:6379/0'),
+    backend=os.environ.get('REDIS_URL', 'redis://localhost:6379/0'),
+)
 
 # --- Configuration (Load from Environment Variables) ---
 # These variables will hold the secrets loaded from environment variables.
 # They are accessed directly by the Flask routes and helper functions.
 GLOBAL_BOX_JWT_CONFIG = None
+GLOBAL_BOX_PRIVATE_KEY = None
 GLOBAL_PDF_CO_API_KEY = None
 
 try:
@@ -25,8 +65,18 @@ try:
     # We expect the full JSON string to be stored in BOX_JWT_CONFIG_JSON
     jwt_config_json_string = os.environ.get('BOX_JWT_CONFIG_JSON')
     if jwt_config_json_string:
-        GLOBAL_BOX_JWT_CONFIG = json.loads(jwt_config_json_string)
+        GLOBAL_BOX_JWT_CONFIG = orjson.loads(jwt_config_json_string)
         print("BOX_JWT_CONFIG loaded from environment variables.")
+        # PEM parsing and RSA key import are CPU-heavy (~10-50ms), so decode
+        # the private key once here instead of on every JWTAuth construction.
+        # The decrypted key lives only in memory and is never logged.
+        app_auth_config = GLOBAL_BOX_JWT_CONFIG['boxAppSettings']['appAuth']
+        key_passphrase = app_auth_config.get('passphrase')
+        GLOBAL_BOX_PRIVATE_KEY = serialization.load_pem_private_key(
+            app_auth_config['privateKey'].encode('utf-8'),
+            password=key_passphrase.encode('utf-8') if key_passphrase else None,
+        )
+        print("Box RSA private key parsed at startup.")
     else:
         # This is a critical warning as the app cannot function without it
         print("CRITICAL WARNING: BOX_JWT_CONFIG_JSON environment variable not found or empty.")
@@ -41,138 +91,21 @@ except Exception as e:
     print(f"CRITICAL ERROR loading secrets from environment variables: {e}")
     # Reset globals to None if there's any loading error to indicate failure
     GLOBAL_BOX_JWT_CONFIG = None
+    GLOBAL_BOX_PRIVATE_KEY = None
     GLOBAL_PDF_CO_API_KEY = None
 
 
-# --- HTML Template for the Main Page and Results ---
-# Using Tailwind CSS for styling. Load Tailwind from CDN.
-HTML_TEMPLATE = """
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Box PDF Merger</title>
-    <script src="https://cdn.tailwindcss.com"></script>
-    <style>
-        body {
-            font-family: 'Inter', sans-serif;
-        }
-        .container {
-            max-width: 28rem; /* Equivalent to max-w-md */
-        }
-        input[type="text"]:focus {
-            outline: none;
-            box-shadow: 0 0 0 3px rgba(59, 130, 246, 0.45); /* Equivalent to focus:ring-2 focus:ring-blue-500 */
-        }
-        button:not([disabled]) {
-            box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1), 0 2px 4px -1px rgba(0, 0, 0, 0.06); /* shadow-md */
-        }
-        button:not([disabled]):hover {
-            box-shadow: 0 10px 15px -3px rgba(0, 0, 0, 0.1), 0 4px 6px -2px rgba(0, 0, 0, 0.05); /* hover:shadow-lg */
-        }
-        .loading-overlay {
-            position: fixed;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background-color: rgba(0, 0, 0, 0.5);
-            display: flex;
-            justify-content: center;
-            align-items: center;
-            z-index: 1000;
-        }
-        .spinner {
-            border: 4px solid rgba(255, 255, 255, 0.3);
-            border-top: 4px solid #fff;
-            border-radius: 50%;
-            width: 50px;
-            height: 50px;
-            animation: spin 1s linear infinite;
-        }
-        @keyframes spin {
-            0% { transform: rotate(0deg); }
-            100% { transform: rotate(360deg); }
-        }
-    </style>
-</head>
-<body class="bg-gray-100 flex items-center justify-center min-h-screen p-4">
-    <div class="bg-white p-8 rounded-xl shadow-lg w-full container">
-        <h1 class="text-3xl font-bold text-gray-800 mb-6 text-center">
-            Box PDF Merger
-        </h1>
-
-        <form action="/merge-pdfs" method="POST" class="space-y-4" onsubmit="showLoading()">
-            <div class="mb-4">
-                <label for="folderId" class="block text-gray-700 text-base font-semibold mb-2">
-                    Box Folder ID:
-                </label>
-                <input
-                    type="text"
-                    id="folderId"
-                    name="box_folder_id"
-                    class="w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 transition duration-200"
-                    placeholder="e.g., 1234567890"
-                    required
-                />
-            </div>
-
-            <div class="mb-6">
-                <label for="mergedFileName" class="block text-gray-700 text-base font-semibold mb-2">
-                    Merged PDF File Name:
-                </label>
-                <input
-                    type="text"
-                    id="mergedFileName"
-                    name="merged_file_name"
-                    class="w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 transition duration-200"
-                    placeholder="e.g., My_Combined_Docs.pdf"
-                    value="Merged_Box_PDF.pdf"
-                    required
-                />
-            </div>
-
-            <button
-                type="submit"
-                id="submitButton"
-                class="w-full bg-blue-600 text-white py-3 px-4 rounded-lg font-semibold hover:bg-blue-700 transition duration-300 ease-in-out"
-            >
-                Start PDF Merge
-            </button>
-        </form>
-
-        {% if message %}
-            <div class="mt-6 p-4 rounded-lg text-lg {% if 'Error' in message or 'Failed' in message %}bg-red-100 text-red-700{% else %}bg-blue-100 text-blue-700{% endif %}">
-                <p class="font-medium">Status:</p>
-                <p>{{ message }}</p>
-                {% if merged_pdf_url %}
-                    <p class="mt-2">Merged PDF: <a href="{{ merged_pdf_url }}" target="_blank" class="text-blue-600 hover:underline">View/Download Here</a></p>
-                {% endif %}
-            </div>
-        {% endif %}
-
-        <div class="mt-8 text-center text-gray-500 text-sm">
-            Please ensure your Box JWT configuration (as JSON) and PDF.co API key are set as environment variables.
-        </div>
-    </div>
-
-    <div id="loadingOverlay" class="loading-overlay" style="display: none;">
-        <div class="text-white text-xl flex flex-col items-center">
-            <div class="spinner mb-4"></div>
-            Processing... This might take a few minutes. Please wait.
-        </div>
-    </div>
-
-    <script>
-        function showLoading() {
-            document.getElementById('loadingOverlay').style.display = 'flex';
-            document.getElementById('submitButton').disabled = true; // Disable button to prevent multiple submissions
-        }
-    </script>
-</body>
-</html>
-"""
+# --- Shared HTTP Session for PDF.co ---
+# One pooled session for all PDF.co traffic (presigned-URL fetches, uploads,
+# merge initiation, status polls, merged-PDF download) so TCP+TLS connections
+# are reused instead of being re-established per request. The retry adapter
+# also absorbs transient 429/5xx responses that previously failed the merge.
+PDF_CO_SESSION = requests.Session()
+PDF_CO_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]),
+))
 
 
 # --- Box API Helper Functions ---
@@ -180,14 +113,13 @@ HTML_TEMPLATE = """
 # ... (your existing app.py code) ...
 
 def initialize_box_client(jwt_config):
-    # These prints will appear in your Render logs
-    print(f"DEBUG: Entering initialize_box_client. Received jwt_config type: {type(jwt_config)}")
-    if jwt_config:
-        print(f"DEBUG: jwt_config keys: {list(jwt_config.keys())}")
+    logger.debug("Entering initialize_box_client. Received jwt_config type: %s", type(jwt_config))
+    if jwt_config and logger.isEnabledFor(logging.DEBUG):
+        logger.debug("jwt_config keys: %s", list(jwt_config.keys()))
         if 'boxAppSettings' in jwt_config:
-            print(f"DEBUG: boxAppSettings keys: {list(jwt_config['boxAppSettings'].keys())}")
+            logger.debug("boxAppSettings keys: %s", list(jwt_config['boxAppSettings'].keys()))
             if 'appAuth' in jwt_config['boxAppSettings']:
-                print(f"DEBUG: appAuth keys: {list(jwt_config['boxAppSettings']['appAuth'].keys())}")
+                logger.debug("appAuth keys: %s", list(jwt_config['boxAppSettings']['appAuth'].keys()))
 
     try:
         client_id = jwt_config['boxAppSettings']['clientID']
@@ -196,30 +128,36 @@ def initialize_box_client(jwt_config):
         private_key_data = jwt_config['boxAppSettings']['appAuth']['privateKey']
         passphrase_data = jwt_config['boxAppSettings']['appAuth'].get('passphrase')
 
-        print(f"DEBUG: Parsed client_id: {client_id}")
-        print(f"DEBUG: Parsed public_key_id: {public_key_id}")
-        print(f"DEBUG: Passphrase data (empty string is fine): '{passphrase_data}'")
-        print(f"DEBUG: Private key: {private_key_data}")
+        logger.debug("Parsed client_id: %s", client_id)
+        logger.debug("Parsed public_key_id: %s", public_key_id)
+
+        # Prefer the key object parsed once at startup; JWTAuth accepts an
+        # RSAPrivateKey directly, skipping the per-construction PEM decode.
+        # The raw PEM path remains as a fallback for ad-hoc configs.
+        if GLOBAL_BOX_PRIVATE_KEY is not None:
+            private_key = GLOBAL_BOX_PRIVATE_KEY
+            passphrase = None
+        else:
+            private_key = private_key_data.encode('utf-8')
+            passphrase = passphrase_data.encode('utf-8') if passphrase_data else None
 
         auth_params = {
             'client_id': client_id,
             'client_secret': client_secret,
             'jwt_key_id': public_key_id,
-            'rsa_private_key_data': private_key_data.encode('utf-8'),
-            'rsa_private_key_passphrase': passphrase_data.encode('utf-8') if passphrase_data else None
+            'rsa_private_key_data': private_key,
+            'rsa_private_key_passphrase': passphrase
         }
 
-        print(f"DEBUG: Auth parameters prepared. Calling JWTAuth with enterpriseID: {jwt_config.get('enterpriseID')}, userID: {jwt_config.get('userID')}")
-        print(f"DEBUG: JWTAuth class: {JWTAuth}, callable: {callable(JWTAuth)}")
+        logger.debug("Auth parameters prepared. Calling JWTAuth with enterpriseID: %s, userID: %s",
+                     jwt_config.get('enterpriseID'), jwt_config.get('userID'))
 
         auth = None # Initialize to None for clearer debugging
         if 'enterpriseID' in jwt_config and jwt_config['enterpriseID']:
             auth_params['enterprise_id'] = jwt_config['enterpriseID']
-            print(f"DEBUG: JWTAuth repr: {repr(JWTAuth(**auth_params))}")
             auth = JWTAuth(**auth_params)
         elif 'userID' in jwt_config and jwt_config['userID']:
             auth_params['user_id'] = jwt_config['userID']
-            print(f"DEBUG: JWTAuth repr: {repr(JWTAuth(**auth_params))}")
             auth = JWTAuth(**auth_params)
         else:
             raise ValueError("Neither 'enterpriseID' nor 'userID' found in BOX_JWT_CONFIG. Cannot determine authentication type.")
@@ -227,55 +165,102 @@ def initialize_box_client(jwt_config):
         if auth is None: # Added check
             raise RuntimeError("JWTAuth object failed to initialize and is None.")
 
-        print("DEBUG: JWTAuth object created successfully. Attempting to create Client object...")
+        logger.debug("JWTAuth object created successfully. Attempting to create Client object...")
         return Client(auth)
-    except Exception as e:
-        print(f"DEBUG: Exception caught inside initialize_box_client: {e}")
-        print("DEBUG: Full traceback:")
-        full_trace = traceback.format_exc()
-        print(f"{full_trace}")
+    except Exception:
+        logger.exception("Exception caught inside initialize_box_client")
         raise # Re-raise to be caught by the Flask route
 
 # ... (rest of your app.py code) ...
 
+# The Box client is cached for the life of the process: constructing one parses
+# the RSA private key, signs a JWT, and performs the OAuth token exchange with
+# Box (~200-500ms of identical work per request). boxsdk refreshes the access
+# token on its own, so a singleton is safe to share. If startup initialization
+# fails (e.g. Box is briefly unreachable), get_box_client() retries lazily
+# under a lock.
+GLOBAL_BOX_CLIENT = None
+_BOX_CLIENT_LOCK = threading.Lock()
+
+def get_box_client():
+    """
+    Returns the process-wide Box client, initializing it on first use.
+    """
+    global GLOBAL_BOX_CLIENT
+    if GLOBAL_BOX_CLIENT is None:
+        with _BOX_CLIENT_LOCK:
+            if GLOBAL_BOX_CLIENT is None:
+                GLOBAL_BOX_CLIENT = initialize_box_client(GLOBAL_BOX_JWT_CONFIG)
+    return GLOBAL_BOX_CLIENT
+
+if GLOBAL_BOX_JWT_CONFIG:
+    try:
+        GLOBAL_BOX_CLIENT = initialize_box_client(GLOBAL_BOX_JWT_CONFIG)
+        print("Box client initialized at startup.")
+    except Exception as e:
+        print(f"WARNING: Box client initialization failed at startup; will retry on first merge: {e}")
+
+# Form retries for the same folder are common, and each one used to repeat the
+# full get_items pagination. A short TTL cache keyed by (folder_id, etag)
+# reuses the previous listing after one cheap etag fetch confirms the folder
+# has not changed. The lock makes the cache safe to touch from worker threads.
+_FOLDER_LISTING_CACHE = TTLCache(maxsize=128, ttl=30)
+_FOLDER_LISTING_LOCK = threading.RLock()
+
 def list_pdf_files_in_box_folder(client, folder_id):
     """
     Lists PDF files in a given Box folder using boxsdk.
     """
     print(f"Listing files in Box folder ID: {folder_id}...")
     try:
-        folder = client.folder(folder_id).get()
+        folder = client.folder(folder_id).get(fields=['etag'])
+        cache_key = (folder_id, folder.etag)
+        with _FOLDER_LISTING_LOCK:
+            cached_files = _FOLDER_LISTING_CACHE.get(cache_key)
+        if cached_files is not None:
+            print(f"Reusing cached listing for Box folder ID: {folder_id}.")
+            return cached_files
+        # Marker-based pagination with a fields projection: the iterator walks
+        # folders with more than one page of items (the old single limit=100
+        # page silently dropped the rest), larger pages mean fewer round-trips,
+        # and requesting only the needed fields keeps per-item payloads small.
+        # shared_link is requested so files that already have a download link
+        # can be handed to PDF.co by URL, skipping the download/upload leg.
+        items = client.folder(folder_id).get_items(limit=1000, fields=['name', 'type', 'shared_link'], use_marker=True)
         pdf_files = []
-        items = folder.get_items(limit=100) # Adjust limit as needed for more files
         for item in items:
-            if item.type == 'file' and item.name.lower().endswith('.pdf'):
-                pdf_files.append({"id": item.id, "name": item.name})
+            if item.type == 'file' and item.name.endswith(('.pdf', '.PDF')):
+                shared_link = getattr(item, 'shared_link', None)
+                pdf_files.append({
+                    "id": item.id,
+                    "name": item.name,
+                    "download_url": shared_link.get('download_url') if shared_link else None,
+                })
+        with _FOLDER_LISTING_LOCK:
+            _FOLDER_LISTING_CACHE[cache_key] = pdf_files
         return pdf_files
     except Exception as e:
         print(f"Error listing files from Box: {e}")
         raise
 
-def download_box_file(client, file_id):
+def download_box_file(client, file_id, stream):
     """
-    Downloads a file from Box using boxsdk.
+    Streams a file's content from Box into the given writable stream using boxsdk.
     """
     print(f"Downloading file ID: {file_id} from Box...")
     try:
-        box_file = client.file(file_id).get()
-        file_content = box_file.content()
-        return file_content
+        client.file(file_id).download_to(stream)
     except Exception as e:
         print(f"Error downloading file from Box (ID: {file_id}): {e}")
         raise
 
-def upload_file_to_box(client, folder_id, file_name, file_content):
+def upload_file_to_box(client, folder_id, file_name, file_stream):
     """
-    Uploads a file to a specified Box folder using boxsdk.
+    Uploads a file stream to a specified Box folder using boxsdk.
     Returns the uploaded file object from Box SDK.
     """
     print(f"Uploading file '{file_name}' to Box folder ID: {folder_id}...")
     try:
-        file_stream = BytesIO(file_content)
         uploaded_file = client.folder(folder_id).upload_stream(file_stream, file_name)
         print(f"Successfully uploaded {file_name} to Box. File ID: {uploaded_file.id}")
         return uploaded_file
@@ -310,9 +295,9 @@ def create_box_shared_link(client, file_id, access_level='open', can_download=Tr
 
 # --- PDF.co API Helper Functions ---
 
-def upload_file_to_pdf_co(file_name, file_content, api_key):
+def upload_file_to_pdf_co(file_name, file_stream, api_key):
     """
-    Uploads a file to PDF.co temporary storage and returns its URL.
+    Uploads a file stream to PDF.co temporary storage and returns its URL.
     """
     if not api_key:
         raise ValueError("PDF.co API key not available for upload.")
@@ -321,17 +306,20 @@ def upload_file_to_pdf_co(file_name, file_content, api_key):
     headers = { "x-api-key": api_key }
     print(f"Getting presigned URL for '{file_name}' from PDF.co...")
     try:
-        response = requests.get(presign_url, headers=headers)
+        response = PDF_CO_SESSION.get(presign_url, headers=headers)
         response.raise_for_status()
-        presign_data = response.json()
+        presign_data = orjson.loads(response.content)
 
         if not presign_data['error']:
             upload_url = presign_data['presignedUrl']
             pdf_co_file_url = presign_data['url']
 
-            upload_headers = { "Content-Type": "application/octet-stream" }
+            file_stream.seek(0, os.SEEK_END)
+            file_size = file_stream.tell()
+            file_stream.seek(0)
+            upload_headers = { "Content-Type": "application/octet-stream", "Content-Length": str(file_size) }
             print(f"Uploading '{file_name}' to PDF.co presigned URL...")
-            upload_response = requests.put(upload_url, data=file_content, headers=upload_headers)
+            upload_response = PDF_CO_SESSION.put(upload_url, data=file_stream, headers=upload_headers)
             upload_response.raise_for_status()
             print(f"Successfully uploaded '{file_name}' to PDF.co temporary storage.")
             return pdf_co_file_url
@@ -362,9 +350,9 @@ def merge_pdfs_pdf_co(file_urls, output_file_name, api_key):
     }
     print(f"Initiating PDF merge on PDF.co for {len(file_urls)} files...")
     try:
-        response = requests.post(url, headers=headers, data=json.dumps(payload))
+        response = PDF_CO_SESSION.post(url, headers=headers, data=orjson.dumps(payload))
         response.raise_for_status()
-        result = response.json()
+        result = orjson.loads(response.content)
 
         if not result['error']:
             job_id = result['jobId']
@@ -380,20 +368,24 @@ def merge_pdfs_pdf_co(file_urls, output_file_name, api_key):
         print(f"An unexpected error occurred during PDF.co merge initiation: {e}")
         raise
 
-def check_pdf_co_job_status(job_id, api_key):
+PDF_CO_JOB_CHECK_URL = "https://api.pdf.co/v1/job/check"
+
+def check_pdf_co_job_status(job_id, headers, etag=None):
     """
     Checks the status of an asynchronous PDF.co job.
+    The caller passes the prebuilt auth headers so the polling loop does not
+    rebuild the header dict and URL string on every check, plus the ETag from
+    the previous poll so an unchanged job can answer 304 with an empty body.
+    Returns a (status, etag) tuple; 304 means the job is still working.
     """
-    if not api_key:
-        raise ValueError("PDF.co API key not available for job status check.")
-
-    url = f"https://api.pdf.co/v1/job/check?jobid={job_id}"
-    headers = { "x-api-key": api_key }
     try:
-        response = requests.get(url, headers=headers)
+        request_headers = headers if etag is None else {**headers, "If-None-Match": etag}
+        response = PDF_CO_SESSION.get(PDF_CO_JOB_CHECK_URL, params={"jobid": job_id}, headers=request_headers)
+        if response.status_code == 304:
+            return "working", etag
         response.raise_for_status()
-        status_data = response.json()
-        return status_data.get('status')
+        status_data = orjson.loads(response.content)
+        return status_data.get('status'), response.headers.get('ETag')
     except requests.exceptions.RequestException as e:
         print(f"Error checking PDF.co job status (Job ID: {job_id}): {e}")
         raise
@@ -403,13 +395,16 @@ def check_pdf_co_job_status(job_id, api_key):
 
 # --- Core Backend Logic ---
 
-def merge_box_pdfs_backend_logic(box_folder_id, box_client, pdf_co_api_key, merged_file_name):
+def merge_box_pdfs_backend_logic(box_folder_id, box_client, pdf_co_api_key, merged_file_name, task=None):
     """
     Core logic to merge PDFs from Box, process with PDF.co, and upload back to Box.
+    When run inside a Celery task, pass the bound task so progress can be reported
+    to the browser via the /status endpoint instead of blocking a web worker.
     Returns a tuple (success: bool, message: str, merged_pdf_url: str or None).
     """
     print("--- Starting PDF Merge Process (Backend Logic) ---")
     merged_box_file_url = None # Initialize to None
+    created_link_file_ids = [] # Shared links made only for this merge; removed in finally
 
     try:
         box_pdf_files = list_pdf_files_in_box_folder(box_client, box_folder_id)
@@ -419,18 +414,60 @@ def merge_box_pdfs_backend_logic(box_folder_id, box_client, pdf_co_api_key, merg
             return False, "Less than two PDF files found. At least two PDFs are required for merging.", None
         print(f"Found {len(box_pdf_files)} PDF files in Box: {[f['name'] for f in box_pdf_files]}")
 
-        pdf_co_source_urls = []
-        for pdf_file in box_pdf_files:
+        @retry(retry=retry_if_exception_type(BoxAPIException),
+               wait=wait_exponential_jitter(initial=1, max=10),
+               stop=stop_after_attempt(4),
+               reraise=True)
+        def prep_pdf_for_merge(pdf_file):
             print(f"Processing '{pdf_file['name']}'...")
+            # PDF.co accepts any reachable URL as a merge source, so a file
+            # that already has a shared download link on Box never needs to
+            # transit this server at all.
+            if pdf_file.get('download_url'):
+                print(f"Using existing Box shared link for '{pdf_file['name']}'.")
+                return pdf_file['download_url']
+            # No existing link: create a shared download link so PDF.co can
+            # fetch the file directly from Box, skipping the transit through
+            # this server entirely. Links created here are removed once the
+            # merge finishes. Fall back to download+upload if the Box app is
+            # not allowed to create shared links.
             try:
-                file_content = download_box_file(box_client, pdf_file['id'])
-                pdf_co_url = upload_file_to_pdf_co(pdf_file['name'], file_content, pdf_co_api_key)
-                if pdf_co_url:
-                    pdf_co_source_urls.append(pdf_co_url)
-                else:
-                    print(f"Skipping '{pdf_file['name']}' due to PDF.co upload failure (no URL returned).")
+                download_url = box_client.file(pdf_file['id']).get_shared_link_download_url(access='open')
+                if download_url:
+                    created_link_file_ids.append(pdf_file['id'])
+                    print(f"Created temporary shared link for '{pdf_file['name']}'.")
+                    return download_url
             except Exception as e:
-                print(f"Skipping '{pdf_file['name']}' due to error during download/upload to PDF.co: {e}")
+                print(f"Could not create shared link for '{pdf_file['name']}'; falling back to upload: {e}")
+            # Spool small PDFs in memory and spill large ones to disk so a
+            # worker never holds more than ~8MB of file content in RAM.
+            with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as spool:
+                download_box_file(box_client, pdf_file['id'], spool)
+                spool.seek(0)
+                return upload_file_to_pdf_co(pdf_file['name'], spool, pdf_co_api_key)
+
+        # Both the Box download and the PDF.co upload are pure network I/O, so
+        # overlapping the per-file transfers in a thread pool cuts the prep
+        # phase roughly by the pool width. The Box SDK client is safe to share
+        # across threads under JWT auth. A throttled file (Box 429) retries
+        # with jittered backoff inside its own worker thread, so it never
+        # holds up the other transfers; results are gathered as they finish
+        # and re-sorted so the merge order matches the folder listing.
+        prepared = []
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = {executor.submit(prep_pdf_for_merge, pdf_file): (index, pdf_file)
+                       for index, pdf_file in enumerate(box_pdf_files)}
+            for future in as_completed(futures):
+                index, pdf_file = futures[future]
+                try:
+                    pdf_co_url = future.result()
+                    if pdf_co_url:
+                        prepared.append((index, pdf_co_url))
+                    else:
+                        print(f"Skipping '{pdf_file['name']}' due to PDF.co upload failure (no URL returned).")
+                except Exception as e:
+                    print(f"Skipping '{pdf_file['name']}' due to error during download/upload to PDF.co: {e}")
+        pdf_co_source_urls = [pdf_co_url for _, pdf_co_url in sorted(prepared)]
 
         if not pdf_co_source_urls:
             return False, "No PDF files were successfully prepared for merging with PDF.co.", None
@@ -445,13 +482,22 @@ def merge_box_pdfs_backend_logic(box_folder_id, box_client, pdf_co_api_key, merg
         # Add a timeout to prevent infinite loops in production
         timeout_seconds = 300 # 5 minutes timeout
         start_time = time.time()
+        # Most merge jobs finish within seconds, so start polling after 1s and
+        # back off exponentially (capped at 10s) instead of a flat 5s sleep,
+        # which added ~2.5s of wasted latency on average per merge.
+        poll_delay = 1.0
+        poll_headers = { "x-api-key": pdf_co_api_key }
+        poll_etag = None
 
         while status == "working":
             if time.time() - start_time > timeout_seconds:
                 return False, "PDF.co merge job timed out. Please try again.", None
-            time.sleep(5) # Wait for 5 seconds before checking again
-            status = check_pdf_co_job_status(job_id, pdf_co_api_key)
+            time.sleep(poll_delay)
+            poll_delay = min(poll_delay * 1.5, 10.0)
+            status, poll_etag = check_pdf_co_job_status(job_id, poll_headers, poll_etag)
             print(f"Current PDF.co job status: {status}")
+            if task is not None:
+                task.update_state(state='PROGRESS', meta={'status': f"PDF.co merge job status: {status}"})
             if status == "success":
                 print("PDF.co merge job completed successfully.")
                 break
@@ -461,14 +507,14 @@ def merge_box_pdfs_backend_logic(box_folder_id, box_client, pdf_co_api_key, merg
         if status != "success":
             return False, "PDF.co merge job did not complete successfully.", None
 
+        # Pipe the merged PDF straight from PDF.co into the Box upload: boxsdk
+        # chunk-reads the response stream, so memory stays O(1) regardless of
+        # merged size and the upload starts before the download finishes.
         print(f"Downloading merged PDF from PDF.co: {merged_pdf_url_pdf_co}")
-        merged_pdf_response = requests.get(merged_pdf_url_pdf_co, allow_redirects=True)
-        merged_pdf_response.raise_for_status()
-        merged_pdf_content = merged_pdf_response.content
-        print("Successfully downloaded merged PDF from PDF.co.")
-
-        # Upload the merged PDF to Box
-        uploaded_box_file = upload_file_to_box(box_client, box_folder_id, merged_file_name, merged_pdf_content)
+        with PDF_CO_SESSION.get(merged_pdf_url_pdf_co, allow_redirects=True, stream=True) as merged_pdf_response:
+            merged_pdf_response.raise_for_status()
+            merged_pdf_response.raw.decode_content = True
+            uploaded_box_file = upload_file_to_box(box_client, box_folder_id, merged_file_name, merged_pdf_response.raw)
 
         if uploaded_box_file:
             print(f"Merged PDF '{merged_file_name}' successfully uploaded to Box. Now creating shared link...")
@@ -487,46 +533,87 @@ def merge_box_pdfs_backend_logic(box_folder_id, box_client, pdf_co_api_key, merg
     except Exception as e:
         print(f"An error occurred during the merge process: {e}")
         return False, f"An error occurred during the process: {e}", None
+    finally:
+        # Remove the shared links that existed only for this merge; links the
+        # files already had (and the merged result's link) are left alone.
+        for file_id in created_link_file_ids:
+            try:
+                box_client.file(file_id).remove_shared_link()
+            except Exception as e:
+                print(f"Warning: could not remove temporary shared link for file ID {file_id}: {e}")
+
+# --- Celery Task ---
+
+@celery.task(bind=True, soft_time_limit=1200, time_limit=1320)
+def merge_task(self, box_folder_id, merged_file_name):
+    """
+    Runs the full merge pipeline in a Celery worker so the POST request can
+    return a job ID immediately instead of holding a WSGI worker for minutes.
+    """
+    box_client = get_box_client()
+    success, message, merged_pdf_url = merge_box_pdfs_backend_logic(
+        box_folder_id, box_client, GLOBAL_PDF_CO_API_KEY, merged_file_name, task=self)
+    return {'success': success, 'message': message, 'merged_pdf_url': merged_pdf_url}
 
 # --- Flask Routes ---
 
 @app.route('/', methods=['GET'])
 def index():
     """
-    Renders the main page with the input form.
+    Serves the form page. Since the async rework the page carries no template
+    variables, so it ships as a static asset — pre-gzipped at build time
+    (static/index.html.gz, regenerate with `gzip -9 -n -k static/index.html`
+    after editing the page) — and never touches Jinja.
     """
-    return render_template_string(HTML_TEMPLATE, message=None, merged_pdf_url=None)
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = app.send_static_file('index.html.gz')
+        response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Content-Type'] = 'text/html; charset=utf-8'
+    else:
+        response = app.send_static_file('index.html')
+    response.headers['Cache-Control'] = 'public, max-age=300'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
 
 @app.route('/merge-pdfs', methods=['POST'])
 def merge_pdfs_endpoint():
     """
-    Handles the form submission, triggers the PDF merge logic, and displays results.
+    Validates the form submission and queues the merge as a Celery job.
+    The browser polls /status/<job_id> for progress and the final result.
     """
     box_folder_id = request.form.get('box_folder_id')
     merged_file_name = request.form.get('merged_file_name', "Merged_Box_PDF.pdf")
 
     if not box_folder_id:
-        return render_template_string(HTML_TEMPLATE, message="Error: Box Folder ID is required.", merged_pdf_url=None)
+        return jsonify({'error': "Box Folder ID is required."}), 400
 
     if not merged_file_name.lower().endswith('.pdf'):
-        return render_template_string(HTML_TEMPLATE, message="Error: Merged file name must end with .pdf", merged_pdf_url=None)
+        return jsonify({'error': "Merged file name must end with .pdf"}), 400
 
     # Use the globally loaded secrets directly
     if not GLOBAL_BOX_JWT_CONFIG:
-        return render_template_string(HTML_TEMPLATE, message="Error: Backend configuration incomplete. Box JWT config not loaded. Check environment variable 'BOX_JWT_CONFIG_JSON'.", merged_pdf_url=None)
+        return jsonify({'error': "Backend configuration incomplete. Box JWT config not loaded. Check environment variable 'BOX_JWT_CONFIG_JSON'."}), 500
     if not GLOBAL_PDF_CO_API_KEY:
-        return render_template_string(HTML_TEMPLATE, message="Error: Backend configuration incomplete. PDF.co API key not loaded. Check environment variable 'PDF_CO_API_KEY'.", merged_pdf_url=None)
+        return jsonify({'error': "Backend configuration incomplete. PDF.co API key not loaded. Check environment variable 'PDF_CO_API_KEY'."}), 500
 
-    box_client = None
-    try:
-        box_client = initialize_box_client(GLOBAL_BOX_JWT_CONFIG)
-    except Exception as e:
-        return render_template_string(HTML_TEMPLATE, message=f"Error: Box client initialization failed: {e}", merged_pdf_url=None)
-
-    # Call the main merge logic with the global secrets
-    success, message, merged_pdf_url = merge_box_pdfs_backend_logic(box_folder_id, box_client, GLOBAL_PDF_CO_API_KEY, merged_file_name)
+    task = merge_task.delay(box_folder_id, merged_file_name)
+    return jsonify({'job_id': task.id})
 
-    return render_template_string(HTML_TEMPLATE, message=message, merged_pdf_url=merged_pdf_url if success else None)
+@app.route('/status/<task_id>', methods=['GET'])
+def merge_status(task_id):
+    """
+    Reports the state of a queued merge job for the browser's polling loop.
+    """
+    task = merge_task.AsyncResult(task_id)
+    payload = {'state': task.state}
+    if task.state == 'FAILURE':
+        payload['info'] = str(task.info)
+    elif task.info is not None:
+        payload['info'] = task.info
+    response = jsonify(payload)
+    # Poll responses must never be cached by the browser or a proxy.
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
 # --- No `if __name__ == '__main__':` block for production ---
 # The WSGI server (like Gunicorn) will directly import the `app` object